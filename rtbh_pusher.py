@@ -14,40 +14,54 @@ This script combines all RTBH automation functionality:
 import os
 import sys
 import glob
+import hashlib
+import json
 import argparse
 import asyncio
 import ipaddress
 import re
 import configparser
-import time
-from typing import List, Tuple, Dict, Optional
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Tuple, Dict, Optional, Union, Iterable, Iterator
 from urllib.parse import urlparse
 
 # Third party imports
 import aiohttp
 from aiohttp import ClientTimeout
-from netaddr import IPSet, IPNetwork
 import paramiko
 from scp import SCPClient
-from netmiko import ConnectHandler
+from netmiko import ConnectHandler, BaseConnection
 
 # Constants
-CHUNK_SIZE = 8192
+CHUNK_SIZE = 131072  # 128 KiB; most blocklists arrive in a handful of reads
 DEFAULT_TIMEOUT = 30
+MAX_CONNECTIONS = 32
+MAX_CONNECTIONS_PER_HOST = 4
+DNS_CACHE_TTL = 300
+SSH_KEEPALIVE_INTERVAL = 30
 USER_AGENT = 'Mozilla/5.0 (compatible; RTBH-Pusher/1.0)'
 CONFIG_FILE = 'configs/rtbh.conf'
 DEFAULT_CISCO_TAG = '66'
 DEFAULT_CISCO_COMMAND_PREFIX = 'ip route'
 DEFAULT_CISCO_COMMAND_SUFFIX = 'Null0 tag'
+COPY_READ_TIMEOUT = 300
 
-def read_config(section: str) -> Dict[str, str]:
-    """Read configuration section from file
-    
-    Args:
-        section: Name of the configuration section to read
+# Interactive prompts of 'copy ... running-config' and the answer to each
+COPY_PROMPTS = [
+    (r"Destination filename", ""),
+    (r"confirm", ""),
+]
+
+IPNetworkType = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+IPInterval = Tuple[int, int, int]  # (version, first_address, last_address)
+
+@functools.lru_cache(maxsize=None)
+def load_config() -> configparser.ConfigParser:
+    """Parse the configuration file once and cache the result
     
     Returns:
-        Dictionary containing configuration key-value pairs
+        Parsed configuration
     """
     config = configparser.ConfigParser(
         allow_no_value=True,
@@ -56,10 +70,33 @@ def read_config(section: str) -> Dict[str, str]:
     if not config.read(CONFIG_FILE):
         print(f"Error: Config file {CONFIG_FILE} not found")
         sys.exit(1)
+    return config
+
+def get_config_section(section: str) -> configparser.SectionProxy:
+    """Get a section of the configuration file, exiting if it is missing
+    
+    Args:
+        section: Name of the configuration section
+    
+    Returns:
+        Configuration section proxy
+    """
+    config = load_config()
     if not config.has_section(section):
         print(f"Error: Missing section '{section}' in config file")
         sys.exit(1)
-    return {k.upper(): v for k, v in config[section].items()}
+    return config[section]
+
+def read_config(section: str) -> Dict[str, str]:
+    """Read configuration section from file
+    
+    Args:
+        section: Name of the configuration section to read
+    
+    Returns:
+        Dictionary containing configuration key-value pairs
+    """
+    return {k.upper(): v for k, v in get_config_section(section).items()}
 
 def read_list_config(section: str) -> List[str]:
     """Read configuration section as list of non-empty, non-comment lines
@@ -70,18 +107,17 @@ def read_list_config(section: str) -> List[str]:
     Returns:
         List of active configuration lines
     """
-    config = configparser.ConfigParser(allow_no_value=True)
-    config.read(CONFIG_FILE)
+    config_section = get_config_section(section)
     if section == 'blocklists':
         return [
             value.strip()
-            for key, value in config[section].items()
+            for key, value in config_section.items()
             if value and not key.startswith('#')
         ]
     else:
         return [
             line.strip() 
-            for line in config[section].keys() 
+            for line in config_section.keys() 
             if line.strip() and not line.startswith('#')
         ]
 
@@ -91,13 +127,66 @@ def ensure_raw_lists_dir() -> None:
         print("Creating raw_lists directory...")
         os.makedirs("./raw_lists")
 
-def clean_old_lists() -> None:
-    """Delete old lists except .myset files"""
+def clean_old_lists(keep: Iterable[str]) -> None:
+    """Delete old lists except .myset files and current downloads
+    
+    Args:
+        keep: Paths of lists downloaded or revalidated in this run
+    """
     print("Cleaning up old lists...")
+    keep = {os.path.normpath(path) for path in keep}
     for f in glob.glob("./raw_lists/*"):
-        if not f.endswith('.myset'):
+        if not f.endswith('.myset') and os.path.normpath(f) not in keep:
             os.remove(f)
 
+def url_digest(url: str) -> str:
+    """Return a short digest of a URL that is stable across runs
+    
+    Args:
+        url: URL to hash
+    
+    Returns:
+        Hex digest of the URL
+    """
+    # hash() is salted per process; use a stable digest
+    return hashlib.blake2b(url.encode(), digest_size=8).hexdigest()
+
+def download_meta_path(url: str) -> str:
+    """Return the path of the cache validator file for a URL
+    
+    The file is hidden so that it is not picked up as an IP list.
+    
+    Args:
+        url: Blocklist URL
+    
+    Returns:
+        Path to the JSON metadata file
+    """
+    return os.path.join("./raw_lists/", f".{url_digest(url)}.meta")
+
+def read_download_meta(url: str) -> Dict[str, str]:
+    """Read cache validators saved by the previous download of a URL
+    
+    Args:
+        url: Blocklist URL
+    
+    Returns:
+        Dictionary with 'path' and optional 'etag' and 'last_modified'
+        keys, or an empty dictionary if no usable cached copy exists
+    """
+    try:
+        with open(download_meta_path(url), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    # Ignore anything that doesn't look like a file we wrote
+    if not isinstance(meta, dict):
+        return {}
+    path = meta.get('path')
+    if not isinstance(path, str) or not os.path.exists(path):
+        return {}
+    return meta
+
 async def download_file(session: aiohttp.ClientSession, url: str) -> Tuple[str, bool]:
     """Download single file asynchronously
     
@@ -108,8 +197,20 @@ async def download_file(session: aiohttp.ClientSession, url: str) -> Tuple[str,
     Returns:
         Tuple containing (filename, success_status)
     """
+    # Revalidate the previous download instead of fetching it again
+    meta = read_download_meta(url)
+    request_headers = {}
+    if isinstance(meta.get('etag'), str):
+        request_headers['If-None-Match'] = meta['etag']
+    if isinstance(meta.get('last_modified'), str):
+        request_headers['If-Modified-Since'] = meta['last_modified']
+    
     try:
-        async with session.get(url) as response:
+        async with session.get(url, headers=request_headers) as response:
+            if response.status == 304 and request_headers:
+                print(f"Not modified, using cached copy: {url}")
+                return meta['path'], True
+            
             if response.status != 200:
                 print(f"Error downloading {url}: HTTP {response.status}")
                 return "", False
@@ -127,17 +228,22 @@ async def download_file(session: aiohttp.ClientSession, url: str) -> Tuple[str,
             if not filename:
                 filename = os.path.basename(urlparse(url).path)
                 if not filename:
-                    filename = "ip_list_" + str(hash(url))
+                    filename = "ip_list_" + url_digest(url)
             
             output_path = os.path.join("./raw_lists/", filename)
             
-            # Download file
+            # Download file, writing chunks from a worker thread so disk
+            # I/O does not stall the other downloads on the event loop
             with open(output_path, 'wb') as f:
-                while True:
-                    chunk = await response.content.read(CHUNK_SIZE)
-                    if not chunk:
-                        break
-                    f.write(chunk)
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    await asyncio.to_thread(f.write, chunk)
+            
+            with open(download_meta_path(url), 'w', encoding='utf-8') as f:
+                json.dump({
+                    'path': output_path,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                }, f)
             
             print(f"Successfully downloaded: {url}")
             return output_path, True
@@ -146,8 +252,12 @@ async def download_file(session: aiohttp.ClientSession, url: str) -> Tuple[str,
         print(f"Error downloading {url}: {str(e)}")
         return "", False
 
-async def download_ip_lists() -> bool:
-    """Download IP lists from configured sources"""
+async def download_ip_lists() -> List[str]:
+    """Download IP lists from configured sources
+    
+    Returns:
+        Paths of the lists that were downloaded or are still current
+    """
     print("\nDownloading IP lists from configuration...")
     
     urls = read_list_config('blocklists')
@@ -156,25 +266,38 @@ async def download_ip_lists() -> bool:
         print("\nError: No active URLs found in configuration")
         print("Please uncomment or add at least one URL with IP blocklist")
         print("Example: https://feodotracker.abuse.ch/downloads/ipblocklist_recommended.txt")
-        return False
+        return []
     
     print(f"Found {len(urls)} active URLs to process")
     timeout = ClientTimeout(total=DEFAULT_TIMEOUT)
     headers = {'User-Agent': USER_AGENT}
     
-    async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-        tasks = [download_file(session, url) for url in urls]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+    # Reuse connections and DNS lookups when several lists share a host
+    connector = aiohttp.TCPConnector(
+        limit=MAX_CONNECTIONS,
+        limit_per_host=MAX_CONNECTIONS_PER_HOST,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        enable_cleanup_closed=True
+    )
+    
+    async with aiohttp.ClientSession(
+        connector=connector,
+        timeout=timeout,
+        headers=headers
+    ) as session:
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(download_file(session, url)) for url in urls]
+        results = [task.result() for task in tasks]
         
         # Check if at least one file was downloaded successfully
-        successful_downloads = [r for r in results if isinstance(r, tuple) and r[1]]
+        successful_downloads = [path for path, success in results if success]
         
         if not successful_downloads:
             print("Error: No files were downloaded successfully")
-            return False
+            return []
         
         print(f"Successfully downloaded {len(successful_downloads)} out of {len(urls)} files")
-        return True
+        return successful_downloads
 
 def check_step(success: bool, step_name: str) -> None:
     """Check if step completed successfully and exit if not
@@ -187,7 +310,140 @@ def check_step(success: bool, step_name: str) -> None:
         print(f"\nError: {step_name} failed")
         sys.exit(1)
 
-def merge_ip_ranges(input_glob: str, output_file: str) -> bool:
+def network_intervals(networks: Iterable[IPNetworkType]) -> List[IPInterval]:
+    """Convert networks into integer address intervals
+    
+    Args:
+        networks: IPv4 and/or IPv6 networks
+    
+    Returns:
+        List of (version, first_address, last_address) tuples
+    """
+    # Derive the last address from the prefix length; broadcast_address
+    # would build a throwaway address object per network
+    return [
+        (n.version,
+         int(n.network_address),
+         int(n.network_address) + (1 << (n.max_prefixlen - n.prefixlen)) - 1)
+        for n in networks
+    ]
+
+def merge_intervals(intervals: List[IPInterval]) -> List[IPInterval]:
+    """Merge overlapping and adjacent address intervals
+    
+    Args:
+        intervals: Address intervals in any order, possibly overlapping
+    
+    Returns:
+        Non-overlapping intervals sorted by IP version, then address
+    """
+    merged = []
+    for version, first, last in sorted(intervals):
+        if merged and merged[-1][0] == version and first <= merged[-1][2] + 1:
+            if last > merged[-1][2]:
+                merged[-1] = (version, merged[-1][1], last)
+        else:
+            merged.append((version, first, last))
+    return merged
+
+def subtract_intervals(
+    intervals: List[IPInterval],
+    excluded: List[IPInterval]
+) -> List[IPInterval]:
+    """Remove excluded address space from a list of intervals
+    
+    Both lists are sorted, so they are walked once with two pointers
+    and the cost is linear in the number of intervals.
+    
+    Args:
+        intervals: Merged intervals, as returned by merge_intervals()
+        excluded: Merged intervals to remove
+    
+    Returns:
+        Sorted intervals covering intervals minus excluded
+    """
+    result = []
+    j = 0
+    for version, start, end in intervals:
+        # Skip exclusions that end before this interval starts
+        while j < len(excluded):
+            ex_version, _, ex_end = excluded[j]
+            if (ex_version, ex_end) >= (version, start):
+                break
+            j += 1
+        
+        k = j
+        while start <= end and k < len(excluded):
+            ex_version, ex_start, ex_end = excluded[k]
+            if ex_version != version or ex_start > end:
+                break
+            if ex_start > start:
+                result.append((version, start, ex_start - 1))
+            start = max(start, ex_end + 1)
+            k += 1
+        if start <= end:
+            result.append((version, start, end))
+    return result
+
+def interval_networks(intervals: Iterable[IPInterval]) -> List[IPNetworkType]:
+    """Convert address intervals into the minimal list of CIDRs
+    
+    Args:
+        intervals: Sorted, non-overlapping address intervals
+    
+    Returns:
+        Sorted list of networks covering the intervals
+    """
+    networks = []
+    for version, first, last in intervals:
+        network_class = ipaddress.IPv4Network if version == 4 else ipaddress.IPv6Network
+        size = last - first + 1
+        # Most intervals are a single aligned CIDR; build it directly
+        if size & (size - 1) == 0 and first & (size - 1) == 0:
+            max_prefixlen = 32 if version == 4 else 128
+            prefixlen = max_prefixlen - size.bit_length() + 1
+            networks.append(network_class((first, prefixlen)))
+            continue
+        address_class = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+        networks.extend(ipaddress.summarize_address_range(
+            address_class(first), address_class(last)
+        ))
+    return networks
+
+def parse_ip_file(filename: str) -> Tuple[List[IPInterval], List[str]]:
+    """Parse a single IP list file into merged address intervals
+    
+    Runs in a worker process, so results are returned rather than printed.
+    Intervals are plain integer tuples, which are cheap to send back to
+    the parent; ipaddress objects would be re-parsed from strings there.
+    
+    Args:
+        filename: Path to the IP list file
+    
+    Returns:
+        Tuple containing (merged_intervals, invalid_lines)
+    """
+    # Blocklists repeat entries, so drop duplicate lines before parsing
+    with open(filename, 'rb') as f:
+        lines = {line.strip() for line in f.read().splitlines()}
+    lines.discard(b'')
+    
+    networks = []
+    invalid_lines = []
+    for line in lines:
+        if line.startswith(b'#'):
+            continue
+        line = line.decode('utf-8', errors='replace')
+        try:
+            networks.append(ipaddress.ip_network(line, strict=False))
+        except ValueError:
+            invalid_lines.append(line)
+    return merge_intervals(network_intervals(networks)), invalid_lines
+
+def merge_ip_ranges(
+    input_glob: str,
+    output_file: str
+) -> Optional[List[IPNetworkType]]:
     """Merge IP lists and apply exclusions
     
     Args:
@@ -195,53 +451,61 @@ def merge_ip_ranges(input_glob: str, output_file: str) -> bool:
         output_file: Path to output file
     
     Returns:
-        bool: True if merge completed successfully
+        Sorted list of merged IPv4 networks, or None if the merge failed
     """
     print("\nMerging lists into ip_list.txt...")
     
     files = glob.glob(input_glob)
     if not files:
         print(f"Warning: No files found matching pattern {input_glob}")
-        return False
+        return None
     
-    # Merge networks from input files
-    merged_set = IPSet()
-    success = False
-    for filename in files:
-        with open(filename, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    try:
-                        network = IPNetwork(line)
-                        merged_set.add(network)
-                        success = True
-                    except Exception as e:
-                        print(f"Skipping invalid network: {line}")
+    # Parse files in parallel worker processes, then union the results
+    if len(files) == 1:
+        results = [parse_ip_file(files[0])]
+    else:
+        workers = min(len(files), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(parse_ip_file, files))
+    intervals = []
+    for file_intervals, invalid_lines in results:
+        for line in invalid_lines:
+            print(f"Skipping invalid network: {line}")
+        intervals.extend(file_intervals)
     
-    if not success:
-        print("Error: No valid networks found in input files")
-        return False
+    # Only IPv4 null routes are generated, so drop IPv6 entries up front
+    ipv4_intervals = [i for i in intervals if i[0] == 4]
+    if len(ipv4_intervals) < len(intervals):
+        print(f"Skipping {len(intervals) - len(ipv4_intervals)} IPv6 range(s); "
+              "only IPv4 null routes are generated")
+    
+    if not ipv4_intervals:
+        print("Error: No valid IPv4 networks found in input files")
+        return None
+    merged = merge_intervals(ipv4_intervals)
     
     # Read exclusions
     exclude_networks = read_list_config('exclude_networks')
-    exclude_set = IPSet()
+    excluded = []
     for network in exclude_networks:
         try:
-            exclude_set.add(IPNetwork(network))
-        except Exception as e:
+            excluded.append(ipaddress.ip_network(network, strict=False))
+        except ValueError:
             print(f"Skipping invalid exclusion: {network}")
     
     # Apply exclusions and save
-    final_set = merged_set - exclude_set
-    if not final_set:
+    final_networks = interval_networks(subtract_intervals(
+        merged,
+        merge_intervals(network_intervals(excluded))
+    ))
+    if not final_networks:
         print("Error: No networks left after applying exclusions")
-        return False
+        return None
 
+    # final_networks is already sorted, so it can be written out as is
     with open(output_file, 'w', encoding='utf-8') as f:
-        for network in final_set.iter_cidrs():
-            f.write(f"{network}\n")
-    return True
+        f.write(''.join(f"{network}\n" for network in final_networks))
+    return final_networks
 
 def calculate_mask(cidr: int) -> List[int]:
     """Calculate subnet mask from CIDR notation
@@ -252,13 +516,33 @@ def calculate_mask(cidr: int) -> List[int]:
     Returns:
         List of four integers representing IPv4 mask octets
     """
-    mask = [0, 0, 0, 0]
-    for i in range(cidr):
-        mask[i // 8] += 1 << (7 - i % 8)
-    return mask
+    mask = (0xFFFFFFFF << (32 - cidr)) & 0xFFFFFFFF
+    return [(mask >> shift) & 0xFF for shift in (24, 16, 8, 0)]
+
+# Dotted-quad mask for every IPv4 prefix length, indexed by CIDR (0-32)
+MASK_STRINGS = ['.'.join(map(str, calculate_mask(cidr))) for cidr in range(33)]
+
+def iter_cisco_commands(
+    networks: Iterable[IPNetworkType],
+    first_command: str,
+    second_command: str
+) -> Iterator[str]:
+    """Yield one newline-terminated Cisco IOS command per IPv4 network
+    
+    Args:
+        networks: IPv4 networks to null route
+        first_command: First part of Cisco command (e.g. 'ip route')
+        second_command: Second part of Cisco command (e.g. 'Null0 tag 66')
+    
+    Yields:
+        Command lines
+    """
+    for network in networks:
+        yield f"{first_command} {network.network_address} {MASK_STRINGS[network.prefixlen]} {second_command}\n"
 
 def generate_cisco_commands(
     config: dict,
+    networks: List[IPNetworkType],
     first_command: str,
     second_command: str
 ) -> bool:
@@ -266,6 +550,7 @@ def generate_cisco_commands(
     
     Args:
         config: Configuration dictionary
+        networks: Merged networks, as returned by merge_ip_ranges()
         first_command: First part of Cisco command (e.g. 'ip route')
         second_command: Second part of Cisco command (e.g. 'Null0 tag 66')
     
@@ -273,55 +558,18 @@ def generate_cisco_commands(
         bool: True if commands were generated successfully
     
     Example:
-        >>> generate_cisco_commands(config, 'ip route', 'Null0 tag 66')
+        >>> generate_cisco_commands(config, networks, 'ip route', 'Null0 tag 66')
         True
     """
-    if os.stat(config['INPUT_IP_LIST']).st_size == 0:
-        print("Error: IP list file is empty")
+    if not networks:
+        print("Error: IP list is empty")
         return False
 
-    with (
-        open(config['INPUT_IP_LIST'], 'r', encoding='utf-8') as f,
-        open(config['OUTPUT_COMMANDS_FILE'], 'w', encoding='utf-8') as fw
-    ):
-        
-        commands = []
-        for line in f:
-            if '#' in line:
-                continue
-
-            try:
-                ipaddress.ip_network(line.strip(), strict=False)
-            except ValueError as e:
-                print(f"Skipping invalid IP/CIDR: {line.strip()} ({str(e)})")
-                continue
-
-            line = line.strip()
-            if '/' not in line:
-                continue
-
-            (addrString, cidrString) = line.split('/')
-            
-            try:
-                cidr = int(cidrString)
-            except ValueError:
-                print(f"Invalid CIDR: {cidrString}")
-                continue
-
-            mask = calculate_mask(cidr)
-            test = f"{first_command} {addrString} {'.'.join(map(str, mask))} {second_command}"
-            commands.append(test)
-
-        output_content = '\n'.join(commands) if commands else ''
-        output_content += '\nend' if commands else 'end'
-        fw.write(output_content)
-    
-    # Post-process commands file
-    with open(config['OUTPUT_COMMANDS_FILE'], 'r+') as f:
-        content = f.read()
-        f.seek(0)
-        f.write(f"no ip route *\n{content}")
-        f.truncate()
+    # Stream commands through the file buffer instead of joining them
+    with open(config['OUTPUT_COMMANDS_FILE'], 'w', encoding='utf-8') as fw:
+        fw.write("no ip route *\n")
+        fw.writelines(iter_cisco_commands(networks, first_command, second_command))
+        fw.write("end")
     
     return True
 
@@ -360,14 +608,14 @@ def upload_file(config: dict) -> None:
     finally:
         client.close()
 
-def apply_config(config: dict) -> None:
-    """Apply configuration to router using SSH
+def connect_router(config: dict) -> BaseConnection:
+    """Open an SSH session to the router
     
     Args:
         config: Configuration dictionary containing router credentials
-        
-    Raises:
-        Exception: If connection or command execution fails
+    
+    Returns:
+        Connected Netmiko session
     """
     device = {
         "device_type": "cisco_ios",
@@ -376,37 +624,47 @@ def apply_config(config: dict) -> None:
         "password": config['CISCO_PASSWORD'],
         "secret": config['CISCO_PASSWORD'],
         "port": 22,
-        "global_delay_factor": 2,
+        # The session sits idle while the commands file is uploaded
+        "keepalive": SSH_KEEPALIVE_INTERVAL,
     }
+    print(f"Connecting to {device['host']}...")
+    return ConnectHandler(**device)
 
+def apply_config(config: dict, net_connect: BaseConnection) -> None:
+    """Apply configuration to router using SSH
+    
+    Args:
+        config: Configuration dictionary containing router credentials
+        net_connect: Session opened by connect_router(), closed on return
+        
+    Raises:
+        Exception: If connection or command execution fails
+    """
     try:
-        print(f"Connecting to {device['host']}...")
-        with ConnectHandler(**device) as net_connect:
+        with net_connect:
             print("Initiating configuration copy...")
             
-            # Send copy command and wait for first prompt
+            # Send copy command, then answer each prompt as soon as it
+            # appears until the router returns to its CLI prompt
             command = f"copy {config['SCP_DESTINATION']} running-config"
-            output = net_connect.send_command_timing(
-                command_string=command,
-                strip_prompt=False,
-                strip_command=False
-            )
+            cli_prompt = rf"{re.escape(net_connect.base_prompt)}[>#]\s*$"
+            pattern = '|'.join([cli_prompt] + [p for p, _ in COPY_PROMPTS])
             
-            # If filename prompt appears, send confirmation
-            if "Destination filename" in output:
-                output += net_connect.send_command_timing(
-                    command_string="\n",
-                    strip_prompt=False,
-                    strip_command=False
-                )
-            
-            # If confirm prompt appears, send confirmation
-            if "confirm" in output:
-                output += net_connect.send_command_timing(
-                    command_string="\n",
-                    strip_prompt=False,
-                    strip_command=False
+            net_connect.write_channel(net_connect.normalize_cmd(command))
+            output = ""
+            while True:
+                chunk = net_connect.read_until_pattern(
+                    pattern=pattern,
+                    re_flags=re.M,
+                    read_timeout=COPY_READ_TIMEOUT
                 )
+                output += chunk
+                if re.search(cli_prompt, chunk, flags=re.M):
+                    break
+                for prompt, answer in COPY_PROMPTS:
+                    if re.search(prompt, chunk):
+                        net_connect.write_channel(answer + net_connect.RETURN)
+                        break
             
             print("\nCommand execution result:")
             print(output)
@@ -418,6 +676,29 @@ def apply_config(config: dict) -> None:
         print(f"Error: {str(e)}")
         sys.exit(1)
 
+def push_config(config: dict) -> None:
+    """Upload the commands file and apply it to the router
+    
+    The SSH session used to apply the configuration is opened in a
+    background thread while the file is uploaded, so the SSH handshake
+    and login overlap with the SCP transfer instead of following it.
+    The session is always disconnected, including when the upload fails.
+    
+    Args:
+        config: Configuration dictionary containing router credentials
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        connecting = executor.submit(connect_router, config)
+        try:
+            upload_file(config)
+        except BaseException:
+            # Don't leave the background session holding a VTY line
+            if connecting.exception() is None:
+                connecting.result().disconnect()
+            raise
+        net_connect = connecting.result()
+    apply_config(config, net_connect)
+
 def main() -> None:
     """Main function that orchestrates the RTBH automation process"""
     try:
@@ -433,13 +714,11 @@ def main() -> None:
 
         # Initialize
         ensure_raw_lists_dir()
-        clean_old_lists()
         
-        # Download lists
-        check_step(
-            asyncio.run(download_ip_lists()),
-            "Downloading IP lists"
-        )
+        # Download lists, then drop any lists that were not refreshed
+        downloaded = asyncio.run(download_ip_lists())
+        check_step(bool(downloaded), "Downloading IP lists")
+        clean_old_lists(downloaded)
         
         # List downloaded files
         print("\nFiles downloaded and ready for processing:")
@@ -447,22 +726,19 @@ def main() -> None:
             print(f"- {os.path.basename(f)}")
         
         # Merge lists
-        check_step(
-            merge_ip_ranges("./raw_lists/*", "ip_list.txt"),
-            "Merging IP lists"
-        )
+        networks = merge_ip_ranges("./raw_lists/*", "ip_list.txt")
+        check_step(networks is not None, "Merging IP lists")
         
         print("\nFinal IP list created: ip_list.txt")
-        with open("ip_list.txt", 'r', encoding='utf-8') as f:
-            ip_count = sum(1 for line in f)
-            print(f"Total unique IPs: {ip_count}")
-            check_step(ip_count > 0, "IP list generation")
+        print(f"Total unique IPs: {len(networks)}")
+        check_step(len(networks) > 0, "IP list generation")
         
-        # Generate commands
+        # Generate commands directly from the merged networks
         config = read_config('router')
         check_step(
             generate_cisco_commands(
                 config,
+                networks,
                 DEFAULT_CISCO_COMMAND_PREFIX,
                 f"{DEFAULT_CISCO_COMMAND_SUFFIX} {DEFAULT_CISCO_TAG}"
             ),
@@ -473,8 +749,7 @@ def main() -> None:
         if not args.no_upload:
             print("\nUploading commands to Cisco router...")
             try:
-                upload_file(config)
-                apply_config(config)
+                push_config(config)
                 print("Router configuration completed successfully")
             except Exception as e:
                 check_step(False, f"Router configuration: {str(e)}")